@@ -1,39 +1,44 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from functools import cached_property
+from typing import Any
 
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, model_validator
 
-class ApiName(BaseModel):
+
+class ApiBaseModel(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+
+class ApiName(ApiBaseModel):
     text: str = Field(..., alias="Text")
-    lang: str | None = Field(None, alias="Lang")
-    source: str | None = Field(None, alias="Source")
 
 
-class ApiProduct(BaseModel):
+class ApiProduct(ApiBaseModel):
     author: str | None = Field(None, alias="Author")
     title: str | None = Field(None, alias="Title")
     publisher: str | None = Field(None, alias="Publisher")
     ref: str | None = Field(None, alias="Ref")
 
 
-class ApiDataFile(BaseModel):
+class ApiDataFile(ApiBaseModel):
     source: str | None = Field(None, alias="Source")
     milieu: str | None = Field(None, alias="Milieu")
 
 
-class ApiSubsector(BaseModel):
+class ApiSubsector(ApiBaseModel):
     name: str = Field(..., alias="Name")
     index: str = Field(..., alias="Index")
     index_number: int = Field(..., alias="IndexNumber")
 
 
-class ApiAllegiance(BaseModel):
+class ApiAllegiance(ApiBaseModel):
     name: str | None = Field(None, alias="Name")
     code: str | None = Field(None, alias="Code")
     base: str | None = Field(None, alias="Base")
 
 
-class ApiBorder(BaseModel):
+class ApiBorder(ApiBaseModel):
     wrap_label: bool | None = Field(None, alias="WrapLabel")
     allegiance: str | None = Field(None, alias="Allegiance")
     label_position: str = Field(..., alias="LabelPosition")
@@ -42,7 +47,7 @@ class ApiBorder(BaseModel):
     show_label: bool | None = Field(None, alias="ShowLabel")
 
 
-class ApiRoute(BaseModel):
+class ApiRoute(ApiBaseModel):
     start: str = Field(..., alias="Start")
     end: str = Field(..., alias="End")
     end_offset_x: int | None = Field(None, alias="EndOffsetX")
@@ -51,7 +56,7 @@ class ApiRoute(BaseModel):
     start_offset_x: int | None = Field(None, alias="StartOffsetX")
 
 
-class ApiSector(BaseModel):
+class ApiSector(ApiBaseModel):
     x: int = Field(..., alias="X")
     y: int = Field(..., alias="Y")
     milieu: str | None = Field(None, alias="Milieu")
@@ -59,17 +64,26 @@ class ApiSector(BaseModel):
     tags: str = Field(..., alias="Tags")
     names: list[ApiName] = Field(..., alias="Names")
 
-    credits: list | None = Field(None, alias="Credits")
     products: list[ApiProduct] | None = Field(None, alias="Products")
     data_file: ApiDataFile | None = Field(None, alias="DataFile")
     subsectors: list[ApiSubsector] | None = Field(None, alias="Subsectors")
     allegiances: list[ApiAllegiance] | None = Field(None, alias="Allegiances")
     stylesheet: str | None = Field(None, alias="Stylesheet")
-    labels: list | None = Field(None, alias="Labels")
     borders: list[ApiBorder] | None = Field(None, alias="Borders")
-    regions: list | None = Field(None, alias="Regions")
     routes: list[ApiRoute] | None = Field(None, alias="Routes")
 
+    @cached_property
+    def name(self) -> str:
+        return self.names[0].text
+
+    @model_validator(mode="before")
+    @classmethod
+    def milieu_from_context(cls, data: Any, info: ValidationInfo) -> Any:  # noqa: ANN401
+        """The metadata endpoint doesn't report the milieu, so let the caller supply it as validation context."""
+        if isinstance(data, dict) and info.context and "milieu" in info.context:
+            return {**data, "Milieu": info.context["milieu"]}
+        return data
+
 
-class ApiModel(BaseModel):
+class ApiModel(ApiBaseModel):
     sectors: list[ApiSector] = Field(..., alias="Sectors")
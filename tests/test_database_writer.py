@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+import tmdownload
+from api_models import ApiSector
+from tmdownload import create_database_engine, database_writer, insert_reference_data
+
+if TYPE_CHECKING:
+    import queue
+    from pathlib import Path
+
+    from sqlalchemy.orm import Session
+
+
+def test_writer_failing_at_startup_still_drains_the_queue(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(_session: Session) -> None:
+        raise RuntimeError
+
+    monkeypatch.setattr(tmdownload, "load_reference_ids", fail)
+    engine = create_database_engine(tmp_path / "test.db")
+    insert_reference_data(engine)
+    sector = ApiSector.model_validate({"X": 0, "Y": 0, "Tags": "OTU", "Names": [{"Text": "Foo"}]})
+
+    with pytest.raises(RuntimeError), database_writer(engine, batch_size=10) as sectors:
+        fill(sectors, (sector, tmp_path))
+
+
+def fill(sectors: queue.Queue[tuple[ApiSector, Path] | None], item: tuple[ApiSector, Path]) -> None:
+    # More than the queue holds, so these puts would block forever if nothing were consuming them.
+    for _ in range(5):
+        sectors.put(item, timeout=10)
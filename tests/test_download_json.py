@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import httpx
+import pytest
+from pydantic import ValidationError
+from yarl import URL
+
+from api_models import ApiSector
+from tmdownload import DownloadCache, download_json
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.mark.parametrize("content", [b"<html>Busy</html>", b"[1, 2]"], ids=["not JSON", "not an object"])
+def test_invalid_sector_json_is_logged_and_raised(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture, content: bytes
+) -> None:
+    sector = ApiSector.model_validate({"X": 0, "Y": 0, "Milieu": "M1105", "Tags": "OTU", "Names": [{"Text": "Foo"}]})
+    (tmp_path / "Foo.json").write_bytes(content)
+    cache = DownloadCache.load(tmp_path, skip_existing=True)
+
+    with caplog.at_level(logging.ERROR), pytest.raises(ValidationError):
+        asyncio.run(download_json(httpx.AsyncClient(), sector, tmp_path, URL("https://example.com/api"), cache=cache))
+
+    assert [record.content for record in caplog.records] == [content.decode()]
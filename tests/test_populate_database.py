@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+import db_models
+from api_models import ApiSector
+from tmdownload import create_database_engine, insert_reference_data, load_reference_ids, populate_database
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+HEADER = "Hex\tName\tUWP\tRemarks\tZone\tBases\tSS\n"
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Engine:
+    engine = create_database_engine(tmp_path / "test.db")
+    insert_reference_data(engine)
+    return engine
+
+
+def populate(engine: Engine, tmp_path: Path, rows: str, header: str = HEADER) -> None:
+    sector = ApiSector.model_validate(
+        {"X": 0, "Y": 0, "Milieu": "M1105", "Tags": "OTU", "Names": [{"Text": "Foo"}], "Subsectors": []}
+    )
+    (tmp_path / "Foo.tsv").write_text(header + rows)
+    with Session(engine, autoflush=False) as session:
+        populate_database(sector, tmp_path, session, load_reference_ids(session), {})
+
+
+def subsectors(engine: Engine) -> list[tuple[str, str]]:
+    with Session(engine) as session:
+        return [tuple(row) for row in session.execute(select(db_models.Subsector.index, db_models.Subsector.name))]
+
+
+def world_names(engine: Engine) -> list[str]:
+    with Session(engine) as session:
+        return list(session.scalars(select(db_models.World.name)))
+
+
+def test_valid_world_creates_placeholder_subsector(engine: Engine, tmp_path: Path) -> None:
+    populate(engine, tmp_path, "0101\tGood\tA788899-C\t\t\t\tA\n")
+
+    assert world_names(engine) == ["Good"]
+    assert subsectors(engine) == [("A", "?")]
+
+
+@pytest.mark.parametrize("uwp", ["A78", "Q788899-C"], ids=["short", "unknown code"])
+def test_skipped_world_creates_no_subsector(engine: Engine, tmp_path: Path, uwp: str) -> None:
+    populate(engine, tmp_path, f"0101\tBad\t{uwp}\t\t\t\tZ\n")
+
+    assert world_names(engine) == []
+    assert subsectors(engine) == []
+
+
+def test_blank_lines_are_skipped(engine: Engine, tmp_path: Path) -> None:
+    populate(engine, tmp_path, "\n0101\tGood\tA788899-C\t\t\t\tA\n\n")
+
+    assert world_names(engine) == ["Good"]
+    assert subsectors(engine) == [("A", "?")]
+
+
+def test_optional_columns_may_be_missing(engine: Engine, tmp_path: Path) -> None:
+    populate(engine, tmp_path, "0101\tGood\tA788899-C\tRi\tA\n", header="Hex\tName\tUWP\tRemarks\tSS\n")
+
+    with Session(engine) as session:
+        world = session.scalars(select(db_models.World)).one()
+    assert (world.name, world.trade_codes, world.zone, world.bases) == ("Good", "Ri", "", "")
+
+
+def test_missing_required_column_is_rejected(engine: Engine, tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="UWP"):
+        populate(engine, tmp_path, "0101\tGood\tA\n", header="Hex\tName\tSS\n")
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+
+from tmdownload import retry_after
+
+
+def test_seconds() -> None:
+    assert retry_after("120", default=1) == 120
+
+
+def test_missing_header_gets_default() -> None:
+    assert retry_after(None, default=1) == 1
+
+
+@pytest.mark.parametrize("header", ["soon", "1.5", "-1", ""])
+def test_unparseable_header_gets_default(header: str) -> None:
+    assert retry_after(header, default=1) == 1
+
+
+@pytest.mark.parametrize("usegmt", [True, False], ids=["GMT", "-0000"])
+def test_http_date(*, usegmt: bool) -> None:
+    when = datetime.now(UTC).replace(microsecond=0) + timedelta(minutes=10)
+    header = format_datetime(when, usegmt=usegmt)
+    if not usegmt:
+        header = header.replace("+0000", "-0000")
+
+    assert 0 < retry_after(header, default=1) <= 600
+
+
+@pytest.mark.parametrize("header", ["Wed, 21 Oct 2015 07:28:00 GMT", "Wed, 21 Oct 2015 07:28:00 -0000"])
+def test_past_http_date_means_no_wait(header: str) -> None:
+    assert retry_after(header, default=1) == 0
@@ -4,7 +4,6 @@
 # dependencies = [
 #     "SQLAlchemy~=2.0",
 #     "httpx[http2]~=0.28",
-#     "brunns-row~=2.2",
 #     "pydantic~=2.0",
 #     "python-json-logger~=3.0",
 #     "tqdm~=4.0",
@@ -15,22 +14,28 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import atexit
 import csv
 import json
 import logging
+import queue
 import sys
 import warnings
-from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import formatdate, parsedate_to_datetime
 from itertools import product
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import httpx
-from brunns.row.rowwrapper import RowWrapper
 from pydantic import ValidationError
-from pythonjsonlogger.json import JsonFormatter
-from sqlalchemy import Engine, create_engine, insert
-from sqlalchemy.exc import IntegrityError, NoResultFound
+from sqlalchemy import Engine, create_engine, event, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 from yarl import URL
@@ -38,10 +43,42 @@ from yarl import URL
 import db_models
 from api_models import ApiModel, ApiSector
 
+try:  # orjson is optional, but makes JSON logging much cheaper - use e.g. `uv run --with orjson tmdownload.py -j`
+    from pythonjsonlogger.orjson import OrjsonFormatter as JsonFormatter
+except ImportError:
+    from pythonjsonlogger.json import JsonFormatter
+
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    import sqlite3
+    from collections.abc import Iterator, Sequence
 
 VERSION = "0.1.0"
+BATCH_SIZE = 5000
+CONCURRENCY = 16
+STREAM_CHUNK_SIZE = 64 * 1024
+RETRY_AFTER_STATUSES = {httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE}
+REFERENCE_ENTITIES = (
+    db_models.Starport,
+    db_models.Size,
+    db_models.Atmosphere,
+    db_models.Hydrosphere,
+    db_models.Population,
+    db_models.Government,
+    db_models.LawLevel,
+    db_models.TechLevel,
+)
+TSV_REQUIRED_COLUMNS = ("Name", "SS", "Hex", "UWP")
+TSV_OPTIONAL_COLUMNS = ("Remarks", "Zone", "Bases")
+# Core rather than ORM insert: worlds are never read back during ingest, so there's no need for the unit of work.
+# Built once, so each batch reuses the same statement and its cached compilation.
+INSERT_WORLD = insert(db_models.Base.metadata.tables[db_models.World.__tablename__])
+SQLITE_FAST_PRAGMAS = [
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+]
 
 LOG_LEVELS = [logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG]
 logger = logging.getLogger(__name__)
@@ -49,203 +86,536 @@ logger = logging.getLogger(__name__)
 
 def main() -> None:
     args = create_parser().parse_args()
+    resolve_default_locations(args)
 
     init_logging(args.verbosity, log_json=args.log_json, silence_packages=["urllib3", "httpcore", "httpx"])
     logger.info("args: %s", args, extra=vars(args))
 
     args.output_location.mkdir(parents=True, exist_ok=True)
     if args.populate_database:
-        args.database_location.unlink(missing_ok=True)
-        engine: Engine | None = create_engine(f"sqlite+pysqlite:///{args.database_location}")
+        for suffix in ["", "-wal", "-shm"]:
+            args.database_location.with_name(args.database_location.name + suffix).unlink(missing_ok=True)
+        engine: Engine | None = create_database_engine(args.database_location, sqlite_fast=args.sqlite_fast)
         insert_reference_data(engine)
     else:
         engine = None
 
-    with (
-        httpx.Client(timeout=30, transport=httpx.HTTPTransport(http2=True, retries=5)) as client,
-        Session(engine) if engine else nullcontext() as session,
-    ):
-        sectors = get_sectors(client, args.output_location, args.travellermap_url)
-
-        pbar = tqdm(sorted(sectors, key=lambda s: (abs(s.x) + abs(s.y), s.names[0].text)))
-        for sector in pbar:
-            pbar.set_description(f"sector {sector.names[0].text}, milieu {sector.milieu}, at {sector.x},{sector.y}")
-            sector_dir = args.output_location / sector.names[0].text / sector.milieu
-            sector_dir.mkdir(parents=True, exist_ok=True)
-
-            download_text(client, sector, sector_dir, args.travellermap_url)
-            decorated_sector = download_json(client, sector, sector_dir, args.travellermap_url)
-            if download_tsv(client, sector, sector_dir, args.travellermap_url) and args.download_posters:
-                for style, scale in product(["poster", "atlas", "fasa"], [64, 128]):
-                    dl_poster(client, sector, sector_dir, args.travellermap_url, style, scale)
+    asyncio.run(download_all(args, engine))
 
-            if args.populate_database and session:
-                populate_database(decorated_sector, sector_dir, session)
 
+async def download_all(args: argparse.Namespace, engine: Engine | None) -> None:
+    # Pool limits belong on the transport: the client ignores its own once a transport is given.
+    transport = RetryAfterTransport(
+        httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=5,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=60),
+        )
+    )
+    cache = DownloadCache.load(args.output_location, skip_existing=args.skip_existing)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30, connect=10), transport=transport) as client:
+        with (
+            database_writer(engine, batch_size=args.batch_size) if engine else nullcontext() as database_queue,
+            saving(cache),
+        ):
+            sectors = await get_sectors(client, args.output_location, args.travellermap_url, cache=cache)
+            sector_dirs = [
+                (sector, args.output_location / sector.name / str(sector.milieu))
+                for sector in sorted(sectors, key=lambda s: (abs(s.x) + abs(s.y), s.name))
+            ]
+            for _, sector_dir in sector_dirs:
+                sector_dir.mkdir(parents=True, exist_ok=True)
+
+            limit = asyncio.Semaphore(args.concurrency)
+            with tqdm(total=len(sectors), mininterval=0.5) as pbar:
+                async with asyncio.TaskGroup() as tg:
+                    for sector, sector_dir in sector_dirs:
+                        tg.create_task(
+                            process_sector(
+                                client,
+                                sector,
+                                args.travellermap_url,
+                                limit=limit,
+                                pbar=pbar,
+                                sector_dir=sector_dir,
+                                cache=cache,
+                                download_posters=args.download_posters,
+                                database_queue=database_queue,
+                            )
+                        )
+
+
+async def process_sector(
+    client: httpx.AsyncClient,
+    sector: ApiSector,
+    travellermap_url: URL,
+    *,
+    sector_dir: Path,
+    limit: asyncio.Semaphore,
+    pbar: tqdm,
+    cache: DownloadCache,
+    download_posters: bool,
+    database_queue: queue.Queue[tuple[ApiSector, Path] | None] | None,
+) -> None:
+    """Download a sector's files, posters too if requested, then queue the sector for the database writer."""
+    try:
+        async with limit:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(download_text(client, sector, sector_dir, travellermap_url, cache=cache))
+                decorated_sector = tg.create_task(
+                    download_json(client, sector, sector_dir, travellermap_url, cache=cache)
+                )
+                has_tsv = tg.create_task(download_tsv(client, sector, sector_dir, travellermap_url, cache=cache))
+            if has_tsv.result() and download_posters:
+                # Only the style and scale vary between a sector's posters.
+                image_url = (
+                    travellermap_url
+                    / sector.name
+                    / "image"
+                    % {"milieu": sector.milieu, "accept": "application/pdf", "options": "9211"}
+                )
+                await asyncio.gather(
+                    *(
+                        dl_poster(
+                            client,
+                            image_url,
+                            sector_dir / f"{sector.name} {style} {scale}.pdf",
+                            style=style,
+                            scale=scale,
+                            cache=cache,
+                        )
+                        for style, scale in product(["poster", "atlas", "fasa"], [64, 128])
+                    )
+                )
 
-def get_sectors(client: httpx.Client, output_location: Path, travellermap_url: URL) -> Sequence[ApiSector]:
-    response = client.get(str(travellermap_url % {"tag": "OTU", "requireData": 1}))
+            if database_queue and has_tsv.result():
+                # The queue is bounded, so the put may block until the writer catches up.
+                await asyncio.to_thread(database_queue.put, (decorated_sector.result(), sector_dir))
+    finally:
+        # Count the sector whether or not it succeeded. Let update() decide whether to redraw, so that bursts of
+        # completions are drawn at most every mininterval.
+        pbar.set_description(f"sector {sector.name}, milieu {sector.milieu}, at {sector.x},{sector.y}", refresh=False)
+        pbar.update()
+
+
+async def get_sectors(
+    client: httpx.AsyncClient, output_location: Path, travellermap_url: URL, *, cache: DownloadCache
+) -> Sequence[ApiSector]:
+    sectors_path = output_location / "sectors.json"
+    if cache.reuse(sectors_path):
+        logger.info("Reusing existing sector list %s", sectors_path)
+        return ApiModel.model_validate_json(sectors_path.read_bytes()).sectors
+
+    sectors_url = str(travellermap_url % {"tag": "OTU", "requireData": 1})
+    response = await client.get(
+        sectors_url, headers=cache.conditional_headers(sectors_url, sectors_path, since_modified=True)
+    )
+    if response.status_code == httpx.codes.NOT_MODIFIED:
+        logger.info("Sector list not modified, using %s", sectors_path)
+        return ApiModel.model_validate_json(sectors_path.read_bytes()).sectors
     response.raise_for_status()
-    with (output_location / "sectors.json").open("w") as f:
-        f.write(response.text)
-    data = ApiModel.model_validate(response.json())
+
+    sectors_path.write_bytes(response.content)
+    cache.remember(sectors_url, response)
+    data = ApiModel.model_validate_json(response.content)
     return data.sectors
 
 
-def download_text(client: httpx.Client, sector: ApiSector, sector_dir: Path, travellermap_url: URL) -> None:
-    sec_text_url = travellermap_url / "sec" % {"sector": sector.names[0].text, "milieu": sector.milieu}
-    response = client.get(str(sec_text_url))
-    response.raise_for_status()
-    with (sector_dir / f"{sector.names[0].text}.txt").open("w") as f:
-        f.write(response.text)
+async def download_text(
+    client: httpx.AsyncClient,
+    sector: ApiSector,
+    sector_dir: Path,
+    travellermap_url: URL,
+    *,
+    cache: DownloadCache,
+) -> None:
+    sec_text_url = travellermap_url / "sec" % {"sector": sector.name, "milieu": sector.milieu}
+    await stream_to_file(client, sec_text_url, sector_dir / f"{sector.name}.txt", cache=cache)
 
 
-def download_json(client: httpx.Client, sector: ApiSector, sector_dir: Path, travellermap_url: URL) -> ApiSector:
-    sec_text_url = (
-        travellermap_url / sector.names[0].text / "metadata" % {"milieu": sector.milieu, "accept": "application/json"}
+async def download_json(
+    client: httpx.AsyncClient,
+    sector: ApiSector,
+    sector_dir: Path,
+    travellermap_url: URL,
+    *,
+    cache: DownloadCache,
+) -> ApiSector:
+    sec_json_url = str(
+        travellermap_url / sector.name / "metadata" % {"milieu": sector.milieu, "accept": "application/json"}
     )
-    response = client.get(str(sec_text_url))
-    response.raise_for_status()
-    with (sector_dir / f"{sector.names[0].text}.json").open("w") as f:
-        f.write(response.text)
+    json_path = sector_dir / f"{sector.name}.json"
+    if cache.reuse(json_path):
+        content = json_path.read_bytes()
+    else:
+        response = await client.get(sec_json_url, headers=cache.conditional_headers(sec_json_url, json_path))
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            content = json_path.read_bytes()
+        else:
+            response.raise_for_status()
+            content = response.content
+            json_path.write_bytes(content)
+            cache.remember(sec_json_url, response)
 
-    response_json = response.json()
     try:
-        return ApiSector.model_validate(dict(response_json, Milieu=sector.milieu))
+        return ApiSector.model_validate_json(content, context={"milieu": sector.milieu})
     except ValidationError as e:
-        logger.exception("ValidationError", extra=dict(response_json), exc_info=e)
+        # The body may not even be JSON, so log it as it came.
+        logger.exception("ValidationError", extra={"content": content.decode(errors="replace")}, exc_info=e)
         raise
 
 
-def download_tsv(client: httpx.Client, sector: ApiSector, sector_dir: Path, travellermap_url: URL) -> bool:
-    sec_tsv_url = (
-        travellermap_url / "sec" % {"sector": sector.names[0].text, "milieu": sector.milieu, "type": "TabDelimited"}
-    )
-    response = client.get(str(sec_tsv_url))
-    response.raise_for_status()
-    if response.text:
-        with (sector_dir / f"{sector.names[0].text}.tsv").open("w") as f:
-            f.write(response.text)
-            return True
-    else:
-        return False
+async def download_tsv(
+    client: httpx.AsyncClient,
+    sector: ApiSector,
+    sector_dir: Path,
+    travellermap_url: URL,
+    *,
+    cache: DownloadCache,
+) -> bool:
+    sec_tsv_url = travellermap_url / "sec" % {"sector": sector.name, "milieu": sector.milieu, "type": "TabDelimited"}
+    return await stream_to_file(client, sec_tsv_url, sector_dir / f"{sector.name}.tsv", cache=cache)
 
 
-def dl_poster(
-    client: httpx.Client, sector: ApiSector, sector_dir: Path, travellermap_url: URL, style: str, scale: int
+async def dl_poster(
+    client: httpx.AsyncClient, image_url: URL, pdf_path: Path, *, style: str, scale: int, cache: DownloadCache
 ) -> None:
-    sec_tile_url = (
-        travellermap_url
-        / sector.names[0].text
-        / "image"
-        % {"milieu": sector.milieu, "accept": "application/pdf", "style": style, "options": "9211", "scale": scale}
-    )
-    pdf_path = sector_dir / f"{sector.names[0].text} {style} {scale}.pdf"
-    if not pdf_path.exists():
-        response = client.get(str(sec_tile_url))
-        response.raise_for_status()
-        with pdf_path.open("wb") as f:
-            f.write(response.content)
+    if pdf_path not in cache.existing:
+        await stream_to_file(client, image_url.update_query(style=style, scale=scale), pdf_path, cache=cache)
+
+
+async def stream_to_file(client: httpx.AsyncClient, url: URL, path: Path, *, cache: DownloadCache) -> bool:
+    """Stream a response body into path, returning whether it had any content. The body is written to a temporary
+    file that is only renamed into place once complete, so an interrupted download never leaves a partial file
+    behind. An empty body leaves path untouched. If the server reports that path is unchanged since it was
+    downloaded, or if it already exists and existing files are being reused, it is kept as is."""
+    if cache.reuse(path):
+        return True
+    url_str = str(url)
+    part_path = path.with_name(f"{path.name}.part")
+    size = 0
+    try:
+        async with client.stream("GET", url_str, headers=cache.conditional_headers(url_str, path)) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                return True
+            response.raise_for_status()
+            with part_path.open("wb") as f:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    size += f.write(chunk)
+        if size:
+            part_path.replace(path)
+            cache.remember(url_str, response)
+    finally:
+        part_path.unlink(missing_ok=True)
+    return size > 0
+
+
+@dataclass
+class DownloadCache:
+    """What earlier runs left in the output location: which files exist, and the validators to conditionally
+    re-request each URL with."""
+
+    etags_path: Path
+    etags: dict[str, dict[str, str]]
+    existing: set[Path]
+    skip_existing: bool = False
+
+    @classmethod
+    def load(cls, output_location: Path, *, skip_existing: bool = False) -> DownloadCache:
+        etags_path = output_location / ".etags.json"
+        try:
+            etags = json.loads(etags_path.read_text())
+        except FileNotFoundError:
+            etags = {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring unreadable %s", etags_path)
+            etags = {}
+        # One directory walk up front, rather than a stat per file as each sector is downloaded.
+        existing = {Path(root, name) for root, _, names in output_location.walk() for name in names}
+        return cls(etags_path, etags, existing, skip_existing=skip_existing)
+
+    def save(self) -> None:
+        self.etags_path.write_text(json.dumps(self.etags, indent=0, sort_keys=True))
+
+    def reuse(self, path: Path) -> bool:
+        return self.skip_existing and path in self.existing
+
+    def conditional_headers(self, url: str, path: Path, *, since_modified: bool = False) -> dict[str, str]:
+        """Headers to make a request for url conditional on path being out of date. If no validators were saved
+        for it, and since_modified is set, fall back to asking whether it has changed since path was written."""
+        if path not in self.existing:
+            return {}
+        if headers := self.etags.get(url):
+            return headers
+        return {"If-Modified-Since": formatdate(path.stat().st_mtime, usegmt=True)} if since_modified else {}
+
+    def remember(self, url: str, response: httpx.Response) -> None:
+        if validators := {
+            header: value
+            for header, value in (
+                ("If-None-Match", response.headers.get("ETag")),
+                ("If-Modified-Since", response.headers.get("Last-Modified")),
+            )
+            if value
+        }:
+            self.etags[url] = validators
+        else:
+            self.etags.pop(url, None)
+
+
+@contextmanager
+def saving(cache: DownloadCache) -> Iterator[None]:
+    """Save the cache on the way out, even after a failure, so that whatever did download needn't be fetched again."""
+    try:
+        yield
+    finally:
+        cache.save()
+
+
+def create_database_engine(database_location: Path, *, sqlite_fast: bool = False) -> Engine:
+    engine = create_engine(f"sqlite+pysqlite:///{database_location}")
+    # pysqlite's own transaction handling defers BEGIN and breaks SAVEPOINTs, which insert_worlds relies on,
+    # so switch it off and emit BEGIN ourselves.
+    event.listen(engine, "connect", disable_pysqlite_transactions)
+    event.listen(engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN"))
+    if sqlite_fast:
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+def disable_pysqlite_transactions(dbapi_connection: sqlite3.Connection, _connection_record: object) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def set_sqlite_pragmas(dbapi_connection: sqlite3.Connection, _connection_record: object) -> None:
+    """Tune SQLite for bulk loading. With synchronous=NORMAL in WAL mode, a crash may lose the most recent
+    transactions, but can't corrupt the database."""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_FAST_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
 
 
 def insert_reference_data(engine: Engine) -> None:
     db_models.Base.metadata.create_all(engine)
     data_dir = Path(__file__).parent / "data"
     with Session(engine) as session:
-        session.execute(insert(db_models.Starport), json.loads((data_dir / "starports.json").read_text()))
-        session.execute(insert(db_models.Size), json.loads((data_dir / "sizes.json").read_text()))
-        session.execute(insert(db_models.Atmosphere), json.loads((data_dir / "atmospheres.json").read_text()))
-        session.execute(insert(db_models.Hydrosphere), json.loads((data_dir / "hydrospheres.json").read_text()))
-        session.execute(insert(db_models.Government), json.loads((data_dir / "governments.json").read_text()))
-        session.execute(insert(db_models.Population), json.loads((data_dir / "populations.json").read_text()))
-        session.execute(insert(db_models.LawLevel), json.loads((data_dir / "law_levels.json").read_text()))
-        session.execute(insert(db_models.TechLevel), json.loads((data_dir / "tech_levels.json").read_text()))
+        for entity in REFERENCE_ENTITIES:
+            session.execute(insert(entity), json.loads((data_dir / f"{entity.__tablename__}.json").read_bytes()))
 
         session.commit()
 
 
-def populate_database(sector: ApiSector, sector_dir: Path, session: Session) -> None:
-    db_milieu = session.query(db_models.Milieu).filter_by(name=sector.milieu).first()
-    if not db_milieu:
-        db_milieu = db_models.Milieu(name=sector.milieu)
-        session.add(db_milieu)
+@contextmanager
+def database_writer(engine: Engine, *, batch_size: int) -> Iterator[queue.Queue[tuple[ApiSector, Path] | None]]:
+    """Populate the database on a background thread, so that database writes overlap with downloads.
+    Yields a queue to put (sector, sector directory) pairs on. On exit, waits for the queued sectors to be written,
+    and re-raises any exception from the writer."""
+    sectors: queue.Queue[tuple[ApiSector, Path] | None] = queue.Queue(maxsize=2)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="database_writer") as executor:
+        writer = executor.submit(write_database, engine, sectors, batch_size=batch_size)
+        try:
+            yield sectors
+        finally:
+            sectors.put(None)
+        writer.result()
 
-    db_sector = (
-        session.query(db_models.Sector)
-        .filter_by(x_coordinate=sector.x, y_coordinate=sector.y, milieu=db_milieu)
-        .first()
-    )
-    if db_sector:
-        db_subsectors: dict[str, db_models.Subsector] = {s.index: s for s in db_sector.subsectors}
-    else:
-        db_sector = db_models.Sector(
-            name=sector.names[0].text, milieu=db_milieu, x_coordinate=sector.x, y_coordinate=sector.y
-        )
-        session.add(db_sector)
-        db_subsectors = {}
-        for subsector in sector.subsectors or []:
-            db_subsector = db_models.Subsector(sector=db_sector, name=subsector.name, index=subsector.index)
-            db_subsectors[subsector.index] = db_subsector
-        session.add_all(db_subsectors.values())
-        session.commit()
 
-    with (sector_dir / f"{sector.names[0].text}.tsv").open("r") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        fieldnames = reader.fieldnames
-        if fieldnames is None:
+def write_database(engine: Engine, sectors: queue.Queue[tuple[ApiSector, Path] | None], *, batch_size: int) -> None:
+    try:
+        with Session(engine, autoflush=False) as session:
+            reference_ids = load_reference_ids(session)
+            milieu_ids: dict[str | None, int] = dict(
+                session.execute(select(db_models.Milieu.name, db_models.Milieu.id)).tuples().all()
+            )
+            for sector, sector_dir in iter(sectors.get, None):
+                populate_database(sector, sector_dir, session, reference_ids, milieu_ids, batch_size=batch_size)
+    except Exception:
+        # Keep consuming until the end of the queue, so the producer can't block on it, then fail.
+        for _ in iter(sectors.get, None):
+            pass
+        raise
+
+
+def populate_database(
+    sector: ApiSector,
+    sector_dir: Path,
+    session: Session,
+    reference_ids: dict[type[db_models.Base], dict[str, int]],
+    milieu_ids: dict[str | None, int],
+    *,
+    batch_size: int = BATCH_SIZE,
+) -> None:
+    sector_name, milieu = sector.name, sector.milieu
+
+    with (sector_dir / f"{sector_name}.tsv").open(newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = next(reader, None)
+        if header is None:
             msg = "TSV has no header row"
             raise ValueError(msg)
-        wrapper = RowWrapper(fieldnames)
-        for row in wrapper.wrap_all(reader):
-            # See https://travellermap.com/doc/fileformats#t5-tab-delimited-format for columns
+        (name_col, ss_col, hex_col, uwp_col), (remarks_col, zone_col, bases_col) = tsv_columns(header)
+        # Only once the TSV is known to be usable, so that nothing is written for a sector that can't be read.
+        sector_id, subsector_ids = find_or_insert_sector(session, sector, milieu_ids)
+        pending: list[dict[str, Any]] = []
+        for row in reader:
+            if not row:
+                # As DictReader did, skip blank lines.
+                continue
+            if len(row) < len(header):
+                row.extend([""] * (len(header) - len(row)))
 
             try:
-                starport, size, atmosphere, hydrosphere, population, government, law_level, _, tech_level, *_ = list(
-                    row.UWP
-                )
-                ss_index = row.SS
-                if ss_index not in db_subsectors:
-                    db_subsector = db_models.Subsector(sector=db_sector, name="?", index=ss_index)
-                    session.add(db_subsector)
-                    db_subsectors[ss_index] = db_subsector
-                world = db_models.World(
-                    name=row.Name,
-                    subsector=db_subsectors[ss_index],
-                    hex_location=row.Hex,
-                    starport=get_relation(db_models.Starport, starport, session),
-                    size=get_relation(db_models.Size, size, session),
-                    atmosphere=get_relation(db_models.Atmosphere, atmosphere, session),
-                    hydrosphere=get_relation(db_models.Hydrosphere, hydrosphere, session),
-                    population=get_relation(db_models.Population, population, session),
-                    government=get_relation(db_models.Government, government, session),
-                    law_level=get_relation(db_models.LawLevel, law_level, session),
-                    tech_level=get_relation(db_models.TechLevel, tech_level, session),
-                    trade_codes=row.Remarks or "",
-                    zone=row.Zone or "",
-                    bases=row.Bases or "",
-                )
-                session.add(world)
-                session.commit()
-            except (NoResultFound, IntegrityError, KeyError, ValueError) as e:
-                logger.warning(
-                    "Exception for world %s, %s, %s, %s, %s - skipped",
-                    sector.milieu,
-                    sector.names[0].text,
-                    row.SS,
-                    row.Name,
-                    row.UWP,
-                    extra=locals(),
-                    exc_info=e,
-                )
-                session.rollback()
+                # UWP is e.g. A788899-C: starport, size, atmosphere, hydrosphere, population, government, law level,
+                # then tech level after the dash.
+                uwp = row[uwp_col]
+                world = {
+                    "name": row[name_col],
+                    "hex_location": row[hex_col],
+                    "starport_id": reference_ids[db_models.Starport][uwp[0]],
+                    "size_id": reference_ids[db_models.Size][uwp[1]],
+                    "atmosphere_id": reference_ids[db_models.Atmosphere][uwp[2]],
+                    "hydrosphere_id": reference_ids[db_models.Hydrosphere][uwp[3]],
+                    "population_id": reference_ids[db_models.Population][uwp[4]],
+                    "government_id": reference_ids[db_models.Government][uwp[5]],
+                    "law_level_id": reference_ids[db_models.LawLevel][uwp[6]],
+                    "tech_level_id": reference_ids[db_models.TechLevel][uwp[8]],
+                    "trade_codes": row[remarks_col] if remarks_col is not None else "",
+                    "zone": row[zone_col] if zone_col is not None else "",
+                    "bases": row[bases_col] if bases_col is not None else "",
+                }
+            except (KeyError, IndexError) as e:
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning(
+                        "Exception for world %s, %s, %s, %s, %s - skipped: %r",
+                        milieu,
+                        sector_name,
+                        row[ss_col],
+                        row[name_col],
+                        row[uwp_col],
+                        e,
+                        extra={
+                            "milieu": milieu,
+                            "sector": sector_name,
+                            "subsector": row[ss_col],
+                            "world": row[name_col],
+                            "uwp": row[uwp_col],
+                            "error": type(e).__name__,
+                        },
+                        exc_info=e if logger.isEnabledFor(logging.DEBUG) else None,
+                    )
+                continue
+
+            # Only once the world is known to be valid, so that a skipped world can't leave a placeholder subsector.
+            ss_index = row[ss_col]
+            if ss_index not in subsector_ids:
+                subsector_ids |= insert_subsectors(session, sector_id, {ss_index: "?"})
+            world["subsector_id"] = subsector_ids[ss_index]
+            pending.append(world)
+
+            if len(pending) >= batch_size:
+                insert_worlds(session, pending, sector)
+                pending.clear()
+        insert_worlds(session, pending, sector)
+
+    session.commit()
+
+
+def tsv_columns(header: Sequence[str]) -> tuple[tuple[int, ...], tuple[int | None, ...]]:
+    """Find the positions of the required Name, SS, Hex and UWP columns, and of the optional Remarks, Zone and Bases
+    columns, which are None if missing."""
+    # See https://travellermap.com/doc/fileformats#t5-tab-delimited-format for columns
+    column = {name: i for i, name in enumerate(header)}
+    if missing := [name for name in TSV_REQUIRED_COLUMNS if name not in column]:
+        msg = f"TSV has no {', '.join(missing)} column"
+        raise ValueError(msg)
+    return tuple(column[name] for name in TSV_REQUIRED_COLUMNS), tuple(
+        column.get(name) for name in TSV_OPTIONAL_COLUMNS
+    )
 
 
-def get_relation[T: db_models.Base](entity: type[T], key: str, session: Session) -> T:
+def find_or_insert_sector(
+    session: Session, sector: ApiSector, milieu_ids: dict[str | None, int]
+) -> tuple[int, dict[str, int]]:
+    """Get the id of a sector and the ids of its subsectors keyed by index, inserting them and the milieu if new."""
+    milieu_id = milieu_ids.get(sector.milieu)
+    if milieu_id is None:
+        # A new milieu has no sectors yet.
+        milieu_id = milieu_ids[sector.milieu] = session.execute(
+            insert(db_models.Milieu).returning(db_models.Milieu.id), {"name": sector.milieu}
+        ).scalar_one()
+        sector_id = None
+    else:
+        sector_id = session.scalars(
+            select(db_models.Sector.id).filter_by(x_coordinate=sector.x, y_coordinate=sector.y, milieu_id=milieu_id)
+        ).first()
+
+    if sector_id is not None:
+        subsector_ids = dict(
+            session.execute(select(db_models.Subsector.index, db_models.Subsector.id).filter_by(sector_id=sector_id))
+            .tuples()
+            .all()
+        )
+    else:
+        sector_id = session.execute(
+            insert(db_models.Sector).returning(db_models.Sector.id),
+            {"name": sector.name, "milieu_id": milieu_id, "x_coordinate": sector.x, "y_coordinate": sector.y},
+        ).scalar_one()
+        subsector_ids = insert_subsectors(
+            session, sector_id, {subsector.index: subsector.name for subsector in sector.subsectors or []}
+        )
+    return sector_id, subsector_ids
+
+
+def insert_worlds(session: Session, worlds: Sequence[dict[str, Any]], sector: ApiSector) -> None:
+    """Insert a batch of worlds in one statement, inside a savepoint of the sector's transaction. If the batch
+    violates a constraint, fall back to inserting row by row so that only the offending worlds are skipped."""
+    if not worlds:
+        return
     try:
-        return session.query(entity).filter_by(code=key).one()
-    except NoResultFound:
-        logger.error("Instance of %s with value %r not found", entity, key)  # noqa: TRY400
-        raise
+        with session.begin_nested():
+            session.execute(INSERT_WORLD, worlds)
+    except IntegrityError:
+        for world in worlds:
+            try:
+                with session.begin_nested():
+                    session.execute(INSERT_WORLD, [world])
+            except IntegrityError as e:
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning(
+                        "Exception for world %s, %s, %s, %s - skipped: %s",
+                        sector.milieu,
+                        sector.name,
+                        world["hex_location"],
+                        world["name"],
+                        e.orig,
+                        extra={
+                            "milieu": sector.milieu,
+                            "sector": sector.name,
+                            "hex": world["hex_location"],
+                            "world": world["name"],
+                            "error": type(e).__name__,
+                        },
+                        exc_info=e if logger.isEnabledFor(logging.DEBUG) else None,
+                    )
+
+
+def insert_subsectors(session: Session, sector_id: int, names_by_index: dict[str, str]) -> dict[str, int]:
+    """Insert subsectors for a sector, returning their ids keyed by subsector index."""
+    if not names_by_index:
+        return {}
+    result = session.execute(
+        insert(db_models.Subsector).returning(db_models.Subsector.id, db_models.Subsector.index),
+        [{"sector_id": sector_id, "index": index, "name": name} for index, name in names_by_index.items()],
+    )
+    return {index: subsector_id for subsector_id, index in result}
+
+
+def load_reference_ids(session: Session) -> dict[type[db_models.Base], dict[str, int]]:
+    """Map each reference table's codes to ids, so that worlds can be inserted without per-row lookups."""
+    return {
+        entity: dict(session.execute(select(entity.code, entity.id)).tuples().all()) for entity in REFERENCE_ENTITIES
+    }
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -262,14 +632,38 @@ def create_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--output-location",
         type=Path,
-        default=Path.cwd() / "out",
-        help="Output location. Default: %(default)s",
+        help="Output location. Default: ./out",
     )
     parser.add_argument(
         "--database-location",
         type=Path,
-        default=Path.cwd() / "out" / "travellermap.db",
-        help="Database location. Default: %(default)s",
+        help="Database location. Default: ./out/travellermap.db",
+    )
+
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Don't re-request the sector list or sector files if they have already been downloaded. "
+        "By default they are re-requested, but only re-downloaded if they have changed.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help="Number of sectors to download at once. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--sqlite-fast",
+        action="store_true",
+        help="Tune SQLite for bulk loading (WAL journal, synchronous=NORMAL, in-memory temp store, larger cache, "
+        "memory-mapped I/O). "
+        "A crash may lose the most recent transactions, but won't corrupt the database.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="Number of worlds to insert into the database per statement. Default: %(default)s",
     )
 
     parser.add_argument(
@@ -286,6 +680,13 @@ def create_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def resolve_default_locations(args: argparse.Namespace) -> None:
+    """Default locations are relative to the current directory, so are only resolved once arguments are parsed."""
+    cwd = Path.cwd()
+    args.output_location = args.output_location or cwd / "out"
+    args.database_location = args.database_location or cwd / "out" / "travellermap.db"
+
+
 def init_logging(
     verbosity: int,
     handler: logging.Handler | None = None,
@@ -298,19 +699,80 @@ def init_logging(
     handler = handler or logging.StreamHandler(stream=sys.stdout)
     level = LOG_LEVELS[min(verbosity, len(LOG_LEVELS) - 1)]
 
-    if level <= logging.DEBUG:
-        msg_format = "%(asctime)s %(levelname)-8s %(name)s %(module)s.py:%(funcName)s():%(lineno)d %(message)s"
-        warnings.filterwarnings("ignore")
+    debug = level <= logging.DEBUG
+    if debug:
+        msg_format = "%(levelname)-8s %(name)s %(module)s.py:%(funcName)s():%(lineno)d %(message)s"
+        warnings.simplefilter("ignore", DeprecationWarning)
     else:
         msg_format = "%(message)s"
 
-    handler.setFormatter(JsonFormatter(msg_format) if log_json else logging.Formatter(fmt=msg_format))
+    if log_json:
+        # JsonFormatter adds an ISO 8601 timestamp field itself, so there's no need to also render %(asctime)s.
+        formatter: logging.Formatter = JsonFormatter(msg_format, timestamp=debug)
+    else:
+        formatter = logging.Formatter(fmt=f"%(asctime)s {msg_format}" if debug else msg_format)
+    handler.setFormatter(formatter)
+
+    # Hand records to a background thread, so that formatting and writing them doesn't block the caller.
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-    logging.basicConfig(level=level, format=msg_format, handlers=[handler])
+    logging.basicConfig(level=level, format=msg_format, handlers=[InProcessQueueHandler(log_queue)])
 
     for package in silence_packages:
         logging.getLogger(package).setLevel(max([level, logging.WARNING]))
 
 
+class RetryAfterTransport(httpx.AsyncBaseTransport):
+    """Retry requests that the server turns away as too busy (429 or 503), waiting as long as its Retry-After header
+    asks, or backing off exponentially if it doesn't say. Connection failures are retried by the wrapped transport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, *, retries: int = 5, max_wait: float = 120) -> None:
+        self.transport = transport
+        self.retries = retries
+        self.max_wait = max_wait
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries):
+            response = await self.transport.handle_async_request(request)
+            if response.status_code not in RETRY_AFTER_STATUSES:
+                return response
+            wait = min(retry_after(response.headers.get("Retry-After"), default=2**attempt), self.max_wait)
+            await response.aclose()
+            logger.info("%s for %s, retrying in %ss", response.status_code, request.url, wait)
+            await asyncio.sleep(wait)
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def retry_after(header: str | None, *, default: float) -> float:
+    """Seconds to wait according to a Retry-After header, which may be either a whole number of seconds or an HTTP
+    date. Anything else, including fractional seconds, gets the default."""
+    if header is None:
+        return default
+    if header.isdigit():
+        return float(header)
+    try:
+        when = parsedate_to_datetime(header)
+    except ValueError:
+        return default
+    if when.tzinfo is None:
+        # A -0000 zone parses as naive, but HTTP dates are always UTC.
+        when = when.replace(tzinfo=UTC)
+    return max((when - datetime.now(UTC)).total_seconds(), 0)
+
+
+class InProcessQueueHandler(QueueHandler):
+    """QueueHandler for a listener in the same process. Records are queued untouched, so that messages, exceptions
+    and extras are formatted by the listener's handler rather than flattened up front."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 if __name__ == "__main__":
     main()